@@ -2,10 +2,25 @@ from flask import Flask, Response, render_template, request, jsonify, send_from_
 import json
 import os
 
+from resource_manager import ResourceManager
+
+# Thread limits must be in place before NumPy/OpenCV are imported by the tracker
+resources = ResourceManager.from_env()
+
 from employee_tracking_fixed import EmployeeTracker
 
 app = Flask(__name__)
-tracker = EmployeeTracker()
+tracker = EmployeeTracker(resources)
+
+# Quick calibration of OpenCV's thread budget, refined once the model is loaded.
+# The full plan is available at /resources.
+if resources.auto_calibrate:
+    try:
+        calibration = resources.calibrate()
+        app.logger.info(f"Startup thread calibration: {calibration['best_threads']} OpenCV threads "
+                        f"on {len(resources.stream_cpus)} stream cores")
+    except Exception as e:
+        app.logger.error(f"Thread calibration failed: {str(e)}")
 
 @app.route('/')
 def index():
@@ -51,6 +66,12 @@ def upload_video():
             "source_type": "upload"
         }
         
+        # Optional presence debouncing and analysis rate settings
+        for key in ("analysis_fps", "presence_window", "presence_enter_ratio", "presence_exit_ratio",
+                    "presence_enter_confidence", "presence_exit_confidence", "presence_ewma_tau"):
+            if key in request.form:
+                config[key] = request.form[key]
+        
         if request.form.get("area_method") == "manual":
             config["manual_coords"] = request.form.get("manual_coords", "0.1,0.1,0.9,0.9")
         
@@ -64,6 +85,20 @@ def stop_tracking():
     """Stop tracking"""
     return jsonify(tracker.stop_tracking())
 
+@app.route('/replay_detections', methods=['POST'])
+def replay_detections():
+    """Re-analyse the last uploaded video from cached detections"""
+    try:
+        config = request.json or {}
+        return jsonify(tracker.replay_cached(config))
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+@app.route('/resources')
+def get_resources():
+    """Get the thread and CPU affinity plan"""
+    return jsonify(resources.report())
+
 @app.route('/status')
 def get_status():
     """Get current tracking status"""
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+class CachedDetections:
+    """Raw per-frame detections for one video, memory-mapped from disk.
+
+    Detections are stored columnar: ``boxes`` (N x 4 normalised cx, cy, w, h),
+    ``scores`` and ``classes`` hold every detection of every frame back to back,
+    and ``offsets`` (F + 1) marks where each frame's detections start and end.
+    ``frame_indices`` and ``timestamps`` give the video position of each frame.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+
+        self.frame_indices = np.load(os.path.join(path, "frames.npy"), mmap_mode="r")
+        self.timestamps = np.load(os.path.join(path, "timestamps.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.boxes = np.load(os.path.join(path, "boxes.npy"), mmap_mode="r")
+        self.scores = np.load(os.path.join(path, "scores.npy"), mmap_mode="r")
+        self.classes = np.load(os.path.join(path, "classes.npy"), mmap_mode="r")
+
+        self._positions = None
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+    def frame(self, i):
+        """Get (boxes, scores, classes) of the i-th cached frame"""
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.boxes[start:end], self.scores[start:end], self.classes[start:end]
+
+    def lookup(self, frame_index):
+        """Get (boxes, scores, classes) for a video frame index, or None if not cached"""
+        if self._positions is None:
+            self._positions = {int(idx): i for i, idx in enumerate(self.frame_indices)}
+        i = self._positions.get(int(frame_index))
+        if i is None:
+            return None
+        return self.frame(i)
+
+
+class DetectionCacheWriter:
+    """Accumulates raw detections frame by frame and commits them to the cache"""
+
+    def __init__(self, cache, key, meta):
+        self.cache = cache
+        self.key = key
+        self.meta = dict(meta)
+        self._frame_indices = []
+        self._timestamps = []
+        self._counts = []
+        self._boxes = []
+        self._scores = []
+        self._classes = []
+        self._seen = set()
+
+    def add(self, frame_index, timestamp, boxes, scores, classes):
+        """Record the detections of one frame. Repeated frame indices are ignored."""
+        if frame_index in self._seen:
+            return
+        self._seen.add(frame_index)
+        self._frame_indices.append(frame_index)
+        self._timestamps.append(timestamp)
+        self._counts.append(len(scores))
+        self._boxes.append(np.asarray(boxes, dtype=np.float32).reshape(-1, 4))
+        self._scores.append(np.asarray(scores, dtype=np.float32))
+        self._classes.append(np.asarray(classes, dtype=np.int16))
+
+    def commit(self, expected_frames=None):
+        """Write the recorded frames to the cache and return the loaded entry
+
+        The entry is marked complete only if it holds every frame from 0 up to
+        ``expected_frames`` (or a gap-free run from 0 when the total is unknown).
+        A pass cut short by a decode error is still stored, but not marked complete.
+        """
+        if not self._frame_indices:
+            return None
+
+        order = np.argsort(self._frame_indices, kind="stable")
+        counts = np.asarray(self._counts, dtype=np.int64)[order]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        columns = {
+            "frames": np.asarray(self._frame_indices, dtype=np.int64)[order],
+            "timestamps": np.asarray(self._timestamps, dtype=np.float64)[order],
+            "offsets": offsets,
+            "boxes": np.concatenate([self._boxes[i] for i in order]),
+            "scores": np.concatenate([self._scores[i] for i in order]),
+            "classes": np.concatenate([self._classes[i] for i in order]),
+        }
+        frames = columns["frames"]
+        contiguous = frames[0] == 0 and frames[-1] == len(frames) - 1
+        if expected_frames is not None and expected_frames > 0:
+            self.meta["complete"] = bool(contiguous and len(frames) == expected_frames)
+        else:
+            self.meta["complete"] = bool(contiguous)
+        self.meta["frames"] = len(counts)
+        self.meta["detections"] = int(counts.sum())
+        self.meta["created"] = time.time()
+        return self.cache._store(self.key, columns, self.meta)
+
+
+class DetectionCache:
+    """Size-bounded on-disk cache of raw detections keyed by video and model config.
+
+    Each entry is a directory of ``.npy`` columns that are memory-mapped on load.
+    When the total size exceeds ``max_bytes`` the least recently used entries
+    are removed.
+    """
+
+    def __init__(self, cache_dir="detection_cache", max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        # Create cache directory if it doesn't exist
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    @staticmethod
+    def file_digest(path, digest=None):
+        """SHA-256 of a file's contents, streamed in 1 MB chunks"""
+        if digest is None:
+            digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest
+
+    @classmethod
+    def make_key(cls, video_path, model_config):
+        """Build a cache key from the video file contents and the model configuration"""
+        digest = cls.file_digest(video_path)
+        digest.update(json.dumps(model_config, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def load(self, key):
+        """Load a cached entry, or return None if it doesn't exist"""
+        path = os.path.join(self.cache_dir, key)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        try:
+            entry = CachedDetections(path)
+        except Exception:
+            # Corrupt or partially deleted entry
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        # Mark as recently used for eviction
+        os.utime(path, None)
+        return entry
+
+    def writer(self, key, meta):
+        """Start recording a new entry"""
+        return DetectionCacheWriter(self, key, meta)
+
+    def _store(self, key, columns, meta):
+        """Atomically write an entry and evict old ones to stay within the size limit"""
+        tmp_path = tempfile.mkdtemp(prefix=".tmp_", dir=self.cache_dir)
+        try:
+            for name, array in columns.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+            path = os.path.join(self.cache_dir, key)
+            if os.path.exists(path):
+                shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        self._evict(keep=key)
+        return self.load(key)
+
+    def _entry_size(self, path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def _evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir() and not entry.name.startswith("."):
+                entries.append((entry.stat().st_mtime, entry.name, self._entry_size(entry.path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            total -= size
@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 import time
 import os
+import logging
 from datetime import datetime
 import urllib.request
 import threading
@@ -9,8 +10,22 @@ import queue
 import tempfile
 from werkzeug.utils import secure_filename
 
+from detection_cache import DetectionCache
+from presence_engine import PresenceEngine
+from resource_manager import ResourceManager
+
+# Raw detections below this score are not kept, so cached replays can't go lower
+CACHE_MIN_CONFIDENCE = 0.05
+
+# Diagnostics that don't belong in the user-facing event log
+logger = logging.getLogger(__name__)
+
 class EmployeeTracker:
-    def __init__(self):
+    def __init__(self, resources=None):
+        # Thread budgets and CPU affinity for this tracker's stream
+        self.resources = resources if resources is not None else ResourceManager()
+        self.stream_name = "tracker"
+        
         # Initialize state variables
         self.is_running = False
         self.tracking_thread = None
@@ -24,6 +39,7 @@ class EmployeeTracker:
         self.absence_logged = False
         self.last_present_time = None
         self.frames_processed = 0
+        self.presence_engine = PresenceEngine()
         
         # Configuration
         self.camera_source = 0
@@ -34,12 +50,22 @@ class EmployeeTracker:
         self.output_dir = "output_frames"
         self.source_type = "webcam"  # Default source type
         self.uploaded_video_path = None
+        self.analysis_interval = 0  # Seconds between analysed frames, 0 = every frame
         
         # Model setup
         self.model_dir = "yolo_model"
         self.net = None
         self.output_layers = None
         
+        # Detection cache for uploaded videos
+        self.detection_cache = DetectionCache(
+            "detection_cache",
+            max_bytes=int(os.environ.get("DETECTION_CACHE_MAX_MB", 512)) * 1024 * 1024
+        )
+        self.video_cache_key = None
+        self.model_digest = None
+        self.frame_size = None
+        
         # Create output directory if it doesn't exist
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
@@ -70,6 +96,10 @@ class EmployeeTracker:
         try:
             self.net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
             
+            # Content digest of the model files, so swapped weights don't hit stale cached detections
+            digest = DetectionCache.file_digest(weights_path)
+            self.model_digest = DetectionCache.file_digest(config_path, digest).hexdigest()
+            
             # Use CPU
             self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
             self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
@@ -83,11 +113,27 @@ class EmployeeTracker:
                 # Alternative approach for newer OpenCV versions
                 self.output_layers = [layer_names[i[0] - 1] for i in self.net.getUnconnectedOutLayers()]
             
+            # Tune OpenCV's thread budget on the real model
+            if self.resources.auto_calibrate:
+                try:
+                    calibration = self.resources.calibrate(self._calibration_workload)
+                    logger.info(f"Calibrated inference threads: {calibration['best_threads']} "
+                                f"(frames/s by thread count: {calibration['throughput']})")
+                except Exception as e:
+                    logger.warning(f"Thread calibration failed: {e}")
+            
             return True
         except Exception as e:
             self.log_event(f"Error loading model: {e}")
             return False
     
+    def _calibration_workload(self):
+        """Run one detection pass on a blank frame, used to calibrate thread budgets"""
+        frame = np.zeros((338, 600, 3), dtype=np.uint8)
+        blob = cv2.dnn.blobFromImage(frame, 1/255.0, (416, 416), swapRB=True, crop=False)
+        self.net.setInput(blob)
+        self.net.forward(self.output_layers)
+    
     def _download_yolo_files(self):
         """Download YOLOv4-tiny model files"""
         if not os.path.exists(self.model_dir):
@@ -189,6 +235,17 @@ class EmployeeTracker:
         self.absence_threshold = float(config.get("absence_threshold", 5))
         self.confidence_threshold = float(config.get("confidence", 0.5))
         
+        # Presence debouncing and analysis rate
+        try:
+            self.presence_engine = PresenceEngine.from_config(config, self.confidence_threshold)
+        except ValueError as e:
+            return {"status": "error", "message": f"Invalid presence settings: {e}"}
+        analysis_fps = float(config.get("analysis_fps", 0) or 0)
+        self.analysis_interval = 1.0 / analysis_fps if analysis_fps > 0 else 0
+        if self.analysis_interval:
+            self.log_event(f"Analysing {analysis_fps:g} frames/s, presence window "
+                           f"{self.presence_engine.window:.1f}s, smoothing {self.presence_engine.ewma_tau:.1f}s")
+        
         # Setup area method
         area_method = config.get("area_method", "auto")
         
@@ -197,6 +254,9 @@ class EmployeeTracker:
             if not self.setup_model():
                 return {"status": "error", "message": "Failed to set up detection model"}
         
+        # The cache key is computed by the tracking thread, hashing the video is too slow for a request
+        self.video_cache_key = None
+        
         # Open camera to get frame dimensions
         cap = self._open_camera()
         if cap is None:
@@ -210,19 +270,13 @@ class EmployeeTracker:
         # Resize frame for consistent processing
         frame = cv2.resize(frame, (600, int(frame.shape[0] * 600 / frame.shape[1])))
         height, width = frame.shape[:2]
+        self.frame_size = (width, height)
         
         # Determine monitoring area
         if area_method == "manual":
             # Parse manually specified area
             try:
-                coords = config.get("manual_coords", "0.1,0.1,0.9,0.9")
-                x1, y1, x2, y2 = map(float, coords.split(','))
-                self.monitor_area = (
-                    int(x1),
-                    int(y1),
-                    int(x2),
-                    int(y2)
-                )
+                self.monitor_area = self._parse_area(config.get("manual_coords", "0.1,0.1,0.9,0.9"))
                 self.log_event(f"Using manually specified area: {self.monitor_area}")
             except:
                 # Default if parsing fails
@@ -242,10 +296,18 @@ class EmployeeTracker:
         self.absence_logged = False
         self.last_present_time = time.time()
         self.frames_processed = 0
+        self.presence_engine.reset()
         
         # Log system start
         self.log_event(f"Tracking started using {self.source_type} source")
         
+        # Reserve cores for this stream and report the plan
+        allocation = self.resources.register_stream(self.stream_name)
+        logger.info(f"Resource plan: {self.resources.opencv_threads} OpenCV threads, "
+                    f"inference cores {allocation['inference']['cpus']}, "
+                    f"decode shares the inference cores with {allocation['decode']['threads']} decoder thread, "
+                    f"encode cores {allocation['encode']['cpus']}")
+        
         # Start tracking thread
         self.is_running = True
         self.tracking_thread = threading.Thread(target=self._tracking_loop)
@@ -280,8 +342,77 @@ class EmployeeTracker:
         
         return {"status": "success", "message": "Tracking stopped"}
     
+    def replay_cached(self, config):
+        """Re-analyse the last uploaded video from cached detections with new settings
+        
+        Accepts the same threshold, area and presence keys as start_tracking and
+        returns the presence events in video time, without running YOLO.
+        """
+        if self.video_cache_key is None:
+            return {"status": "error", "message": "No uploaded video to replay"}
+        
+        entry = self.detection_cache.load(self.video_cache_key)
+        if entry is None or not entry.meta.get("complete"):
+            return {"status": "error", "message": "No cached detections yet, let the video play through once"}
+        
+        try:
+            absence_threshold = float(config.get("absence_threshold", self.absence_threshold))
+            confidence_threshold = float(config.get("confidence", self.confidence_threshold))
+            if config.get("area_method") == "manual":
+                monitor_area = self._parse_area(config.get("manual_coords", "0.1,0.1,0.9,0.9"))
+            else:
+                monitor_area = self.monitor_area
+            engine = PresenceEngine.from_config(config, confidence_threshold)
+        except ValueError as e:
+            return {"status": "error", "message": f"Invalid replay settings: {e}"}
+        
+        if monitor_area is None:
+            return {"status": "error", "message": "No monitoring area available"}
+        if confidence_threshold < entry.meta["min_confidence"]:
+            return {"status": "error",
+                    "message": f"Confidence must be at least {entry.meta['min_confidence']} for cached replay"}
+        
+        width, height = entry.meta["frame_size"]
+        events = []
+        employee_present = False
+        absence_start_time = None
+        absence_logged = False
+        
+        start = time.time()
+        for i in range(len(entry)):
+            timestamp = float(entry.timestamps[i])
+            _, employee_detected, employee_confidence = self._match_people(
+                *entry.frame(i), width, height, monitor_area, confidence_threshold)
+            
+            change = engine.update(timestamp, employee_detected, employee_confidence)
+            if change is True:
+                employee_present = True
+                if absence_start_time is not None:
+                    events.append({"time": timestamp, "event": "returned",
+                                   "absence_duration": timestamp - absence_start_time})
+                    absence_start_time = None
+                    absence_logged = False
+            elif change is False:
+                employee_present = False
+                absence_start_time = engine.last_seen if engine.last_seen is not None else timestamp
+            
+            if not employee_present and absence_start_time is not None and not absence_logged:
+                if timestamp - absence_start_time >= absence_threshold:
+                    events.append({"time": timestamp, "event": "absent"})
+                    absence_logged = True
+        elapsed = time.time() - start
+        
+        return {
+            "status": "success",
+            "frames": len(entry),
+            "elapsed": elapsed,
+            "fps": len(entry) / elapsed if elapsed > 0 else None,
+            "events": events
+        }
+    
     def get_current_frame(self):
         """Get the latest processed frame for the video feed"""
+        self.resources.apply(self.stream_name, "encode")
         with self.lock:
             if self.current_frame is not None:
                 # Encode the image as JPEG
@@ -302,7 +433,7 @@ class EmployeeTracker:
         try:
             if self.source_type == "upload" and self.uploaded_video_path:
                 # Use uploaded video file
-                cap = cv2.VideoCapture(self.uploaded_video_path)
+                cap = self._video_capture(self.uploaded_video_path)
                 if not cap.isOpened():
                     self.log_event(f"Error: Could not open uploaded video {self.uploaded_video_path}")
                     return None
@@ -310,12 +441,12 @@ class EmployeeTracker:
             elif self.source_type == "webcam":
                 # Use webcam
                 if isinstance(self.camera_source, int) or self.camera_source.isdigit():
-                    cap = cv2.VideoCapture(int(self.camera_source))
+                    cap = self._video_capture(int(self.camera_source))
                 else:
-                    cap = cv2.VideoCapture(self.camera_source)
+                    cap = self._video_capture(self.camera_source)
             elif self.source_type == "custom":
                 # Use custom URL
-                cap = cv2.VideoCapture(self.camera_source)
+                cap = self._video_capture(self.camera_source)
             else:
                 self.log_event(f"Unsupported source type: {self.source_type}")
                 return None
@@ -329,6 +460,31 @@ class EmployeeTracker:
             self.log_event(f"Error opening camera: {str(e)}")
             return None
     
+    def _video_capture(self, source):
+        """Open a VideoCapture with the stream's decode thread budget, if the backend allows it"""
+        params = self.resources.capture_params(self.stream_name)
+        if params:
+            cap = cv2.VideoCapture(source, cv2.CAP_ANY, params)
+            if cap.isOpened():
+                return cap
+            cap.release()
+        return cv2.VideoCapture(source)
+    
+    def _model_signature(self):
+        """Describe the detection model setup, used to key cached detections"""
+        return {
+            "model": "yolov4-tiny",
+            "model_digest": self.model_digest,
+            "input_size": 416,
+            "frame_width": 600,
+            "min_confidence": CACHE_MIN_CONFIDENCE
+        }
+    
+    def _parse_area(self, coords):
+        """Parse an "x1,y1,x2,y2" string into a monitoring area tuple"""
+        x1, y1, x2, y2 = map(float, coords.split(','))
+        return (int(x1), int(y1), int(x2), int(y2))
+    
     def _detect_desk_area(self, cap):
         """Detect the desk area using object detection"""
         self.log_event("Detecting desk area...")
@@ -421,19 +577,50 @@ class EmployeeTracker:
     
     def _tracking_loop(self):
         """Main tracking loop that runs in a separate thread"""
+        # Decode and inference both run on this thread
+        self.resources.apply(self.stream_name, "inference")
+        
         # Open camera
         cap = self._open_camera()
         if cap is None:
             self.log_event("Failed to open camera in tracking loop")
             self.is_running = False
+            self.resources.unregister_stream(self.stream_name)
             return
         
         try:
             last_save_time = time.time()
+            last_analysis_time = None
             
             # For uploaded videos, set loop behavior
             video_ended = False
             
+            # Replay cached detections for uploaded videos, or record them on the first pass
+            cache_entry = None
+            cache_writer = None
+            video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            if self.source_type == "upload":
+                try:
+                    self.video_cache_key = self.detection_cache.make_key(
+                        self.uploaded_video_path, self._model_signature())
+                except Exception as e:
+                    self.log_event(f"Detection cache disabled for this video: {e}")
+            
+            if self.video_cache_key is not None:
+                cache_entry = self.detection_cache.load(self.video_cache_key)
+                if cache_entry is not None and not cache_entry.meta.get("complete"):
+                    # Entries missing frames are re-recorded rather than replayed
+                    cache_entry = None
+                if cache_entry is not None:
+                    self.log_event(f"Using cached detections for {len(cache_entry)} frames")
+                else:
+                    cache_writer = self.detection_cache.writer(self.video_cache_key, {
+                        "frame_size": list(self.frame_size),
+                        "fps": video_fps,
+                        "min_confidence": CACHE_MIN_CONFIDENCE,
+                        "model": self._model_signature()
+                    })
+            
             while self.is_running:
                 # Read a frame
                 ret, frame = cap.read()
@@ -441,6 +628,20 @@ class EmployeeTracker:
                 # Handle end of video for uploaded files
                 if not ret:
                     if self.source_type == "upload":
+                        # The pass has ended (end of video or a read error), store what was recorded
+                        if cache_writer is not None:
+                            try:
+                                expected_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                                cache_entry = cache_writer.commit(expected_frames)
+                                if cache_entry is not None and cache_entry.meta["complete"]:
+                                    self.log_event(f"Cached detections for {len(cache_entry)} frames")
+                                elif cache_entry is not None:
+                                    self.log_event(f"Detection cache incomplete: recorded {len(cache_entry)} "
+                                                   f"of {expected_frames} frames, not using it for replay")
+                            except Exception as e:
+                                self.log_event(f"Error writing detection cache: {e}")
+                            cache_writer = None
+                        
                         # If we're using an uploaded video and it's ended, loop it
                         cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
                         ret, frame = cap.read()
@@ -455,40 +656,67 @@ class EmployeeTracker:
                         self.log_event("Failed to read frame, camera disconnected?")
                         break
                 
+                frame_index = None
+                if self.source_type == "upload":
+                    frame_index = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+                
+                # Skip analysis of this frame if the configured analysis rate allows it.
+                # Presence decisions are timestamp based, so dropped frames don't skew them.
+                # While recording the detection cache every frame is analysed so the entry is complete.
+                current_time = time.time()
+                if (self.analysis_interval and cache_writer is None and last_analysis_time is not None
+                        and current_time - last_analysis_time < self.analysis_interval):
+                    # Keep the preview at full rate, showing the last presence decision
+                    frame = cv2.resize(frame, (600, int(frame.shape[0] * 600 / frame.shape[1])))
+                    self._draw_status(frame)
+                    with self.lock:
+                        self.current_frame = frame
+                    time.sleep(0.033 if self.source_type == "upload" else 0.01)
+                    continue
+                last_analysis_time = current_time
+                
                 # Resize frame for faster processing
                 frame = cv2.resize(frame, (600, int(frame.shape[0] * 600 / frame.shape[1])))
                 height, width = frame.shape[:2]
                 
                 # Process frame for person detection
-                processed_frame, employee_detected = self._process_frame(frame)
+                raw_detections = None
+                if cache_entry is not None and frame_index is not None:
+                    raw_detections = cache_entry.lookup(frame_index)
+                processed_frame, employee_detected, employee_confidence, raw_detections = \
+                    self._process_frame(frame, raw_detections)
+                if cache_writer is not None and raw_detections is not None:
+                    cache_writer.add(frame_index, frame_index / video_fps, *raw_detections)
                 
-                # Update employee presence status
-                current_time = time.time()
+                # Update employee presence status through the debouncing engine
+                change = self.presence_engine.update(current_time, employee_detected, employee_confidence)
                 
-                if employee_detected:
-                    if not self.employee_present:
-                        # Employee has returned
-                        self.employee_present = True
-                        if self.absence_start_time is not None:
-                            absence_duration = current_time - self.absence_start_time
-                            self.log_event(f"Employee returned after {absence_duration:.1f} seconds")
-                            self.absence_start_time = None
-                            self.absence_logged = False
-                    
+                if change is True:
+                    # Employee has returned
+                    self.employee_present = True
+                    if self.absence_start_time is not None:
+                        absence_duration = current_time - self.absence_start_time
+                        self.log_event(f"Employee returned after {absence_duration:.1f} seconds")
+                        self.absence_start_time = None
+                        self.absence_logged = False
+                elif change is False:
+                    # Absence confirmed, count it from the last positive detection
+                    self.employee_present = False
+                    last_seen = self.presence_engine.last_seen
+                    self.absence_start_time = last_seen if last_seen is not None else current_time
+                
+                if self.employee_present:
                     self.last_present_time = current_time
                 else:
-                    # If employee is not detected
-                    if self.employee_present:
-                        # First frame where employee is absent
-                        self.employee_present = False
-                        self.absence_start_time = current_time
-                    elif self.absence_start_time is not None:
+                    if self.absence_start_time is not None:
                         # Check if absence threshold is reached
                         absence_duration = current_time - self.absence_start_time
                         if absence_duration >= self.absence_threshold and not self.absence_logged:
                             self.log_event("Employee absence detected")
                             self.absence_logged = True
                 
+                self._draw_status(processed_frame)
+                
                 # Save the processed frame for the web UI
                 with self.lock:
                     self.current_frame = processed_frame
@@ -513,13 +741,45 @@ class EmployeeTracker:
             # Clean up
             cap.release()
             self.is_running = False
+            self.resources.unregister_stream(self.stream_name)
             self.log_event("Tracking loop ended")
     
-    def _process_frame(self, frame):
-        """Process a frame to detect people and update status"""
+    def _process_frame(self, frame, raw_detections=None):
+        """Process a frame to detect people in the monitored area
+        
+        If raw_detections is given (e.g. from the detection cache) YOLO is not run.
+        Returns the annotated frame, whether the employee was detected, the
+        employee's detection confidence and the raw detections used.
+        """
         height, width = frame.shape[:2]
-        employee_detected = False
         
+        if raw_detections is None:
+            raw_detections = self._detect_raw(frame)
+            if raw_detections is None:
+                return frame, False, 0.0, None
+        
+        people, employee_detected, employee_confidence = self._match_people(
+            *raw_detections, width, height, self.monitor_area, self.confidence_threshold)
+        
+        # Draw person boxes with different colors
+        for x, y, w, h, confidence, is_in_desk_area in people:
+            if is_in_desk_area:
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 0, 255), 2)  # Red for employee in desk area
+                label = f"Employee: {confidence:.2f}"
+                cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+            else:
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)  # Blue for other people
+                label = f"Person: {confidence:.2f}"
+                cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+        
+        return frame, employee_detected, employee_confidence, raw_detections
+    
+    def _detect_raw(self, frame):
+        """Run YOLO on a frame and return raw (boxes, scores, class_ids) arrays
+        
+        Boxes are normalised (center_x, center_y, w, h) as output by the network.
+        Detections scoring below CACHE_MIN_CONFIDENCE are dropped.
+        """
         # Create a blob from the frame and perform object detection
         blob = cv2.dnn.blobFromImage(frame, 1/255.0, (416, 416), swapRB=True, crop=False)
         self.net.setInput(blob)
@@ -528,73 +788,75 @@ class EmployeeTracker:
             detections = self.net.forward(self.output_layers)
         except Exception as e:
             self.log_event(f"Error during detection: {e}")
-            return frame, False
-        
-        # Variables to store detection info
-        boxes = []
-        confidences = []
-        class_ids = []
-        
-        # Process detections to find people
-        for detection in detections:
-            for obj_detection in detection:
-                scores = obj_detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                
-                # Check if the detected object is a person (class ID 0 for COCO dataset)
-                if confidence > self.confidence_threshold and class_id == 0:  # 0 is index for person in COCO
-                    center_x = int(obj_detection[0] * width)
-                    center_y = int(obj_detection[1] * height)
-                    w = int(obj_detection[2] * width)
-                    h = int(obj_detection[3] * height)
-                    
-                    # Calculate top-left corner coordinates of the bounding box
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-                    
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
+            return None
+        
+        outputs = np.vstack(detections)
+        class_scores = outputs[:, 5:]
+        class_ids = np.argmax(class_scores, axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = scores > CACHE_MIN_CONFIDENCE
+        
+        return (outputs[keep, :4].astype(np.float32),
+                scores[keep].astype(np.float32),
+                class_ids[keep].astype(np.int16))
+    
+    def _match_people(self, boxes, scores, class_ids, width, height, monitor_area, confidence_threshold):
+        """Find people in raw detections and check which of them are in the monitored area
+        
+        Returns a list of (x, y, w, h, confidence, is_in_desk_area) for every person
+        kept after non-maximum suppression, whether the employee was detected and
+        the highest confidence of a person in the area.
+        """
+        people = []
+        employee_detected = False
+        employee_confidence = 0.0
+        
+        # Check if the detected object is a person (class ID 0 for COCO dataset)
+        mask = (np.asarray(scores) > confidence_threshold) & (np.asarray(class_ids) == 0)
+        if not mask.any():
+            return people, employee_detected, employee_confidence
+        
+        selected = np.asarray(boxes)[mask]
+        center_x = (selected[:, 0] * width).astype(int)
+        center_y = (selected[:, 1] * height).astype(int)
+        w = (selected[:, 2] * width).astype(int)
+        h = (selected[:, 3] * height).astype(int)
+        
+        # Calculate top-left corner coordinates of the bounding box
+        x = (center_x - w / 2).astype(int)
+        y = (center_y - h / 2).astype(int)
+        
+        person_boxes = np.stack([x, y, w, h], axis=1).tolist()
+        confidences = np.asarray(scores)[mask].astype(float).tolist()
         
         # Apply non-maximum suppression to remove redundant overlapping boxes
-        if len(boxes) > 0:
-            indices = cv2.dnn.NMSBoxes(boxes, confidences, self.confidence_threshold, 0.4)
+        indices = cv2.dnn.NMSBoxes(person_boxes, confidences, confidence_threshold, 0.4)
+        
+        for i in np.asarray(indices, dtype=int).flatten():
+            bx, by, bw, bh = person_boxes[i]
             
-            # Check if any person was detected in the monitored area
-            if len(indices) > 0:
-                for i in indices.flatten():
-                    x, y, w, h = boxes[i]
-                    
-                    # Calculate person box
-                    person_box = (x, y, x+w, y+h)
-                    
-                    # Calculate intersection with monitor area
-                    x_intersection = max(self.monitor_area[0], person_box[0])
-                    y_intersection = max(self.monitor_area[1], person_box[1])
-                    w_intersection = min(self.monitor_area[2], person_box[2]) - x_intersection
-                    h_intersection = min(self.monitor_area[3], person_box[3]) - y_intersection
-                    
-                    is_in_desk_area = False
-                    if w_intersection > 0 and h_intersection > 0:
-                        intersection_area = w_intersection * h_intersection
-                        person_area = w * h
-                        overlap_ratio = intersection_area / person_area
-                        
-                        if overlap_ratio > 0.3:  # If more than 30% of person is in desk area
-                            employee_detected = True
-                            is_in_desk_area = True
-                    
-                    # Draw person boxes with different colors
-                    if is_in_desk_area:
-                        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 0, 255), 2)  # Red for employee in desk area
-                        label = f"Employee: {confidences[i]:.2f}"
-                        cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-                    else:
-                        cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)  # Blue for other people
-                        label = f"Person: {confidences[i]:.2f}"
-                        cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+            # Calculate intersection with monitor area
+            x_intersection = max(monitor_area[0], bx)
+            y_intersection = max(monitor_area[1], by)
+            w_intersection = min(monitor_area[2], bx + bw) - x_intersection
+            h_intersection = min(monitor_area[3], by + bh) - y_intersection
+            
+            is_in_desk_area = False
+            if w_intersection > 0 and h_intersection > 0:
+                intersection_area = w_intersection * h_intersection
+                overlap_ratio = intersection_area / (bw * bh)
+                
+                if overlap_ratio > 0.3:  # If more than 30% of person is in desk area
+                    employee_detected = True
+                    is_in_desk_area = True
+                    employee_confidence = max(employee_confidence, confidences[i])
+            
+            people.append((bx, by, bw, bh, confidences[i], is_in_desk_area))
         
+        return people, employee_detected, employee_confidence
+    
+    def _draw_status(self, frame):
+        """Draw the monitoring area and debounced presence status onto a frame"""
         # Draw monitoring area
         cv2.rectangle(frame, 
                      (self.monitor_area[0], self.monitor_area[1]), 
@@ -602,11 +864,11 @@ class EmployeeTracker:
                      (0, 255, 0), 2)  # Green rectangle for monitored area
         
         # Display status on frame
-        status_text = "Status: PRESENT" if employee_detected else "Status: ABSENT"
+        status_text = "Status: PRESENT" if self.employee_present else "Status: ABSENT"
         cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                   0.7, (0, 255, 0) if employee_detected else (0, 0, 255), 2)
+                   0.7, (0, 255, 0) if self.employee_present else (0, 0, 255), 2)
         
-        if not employee_detected and self.absence_start_time is not None:
+        if not self.employee_present and self.absence_start_time is not None:
             absence_duration = time.time() - self.absence_start_time
             duration_text = f"Absence: {absence_duration:.1f}s"
             cv2.putText(frame, duration_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
@@ -619,4 +881,4 @@ class EmployeeTracker:
         cv2.putText(frame, f"Source: {self.source_type}", (10, 110), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         
-        return frame, employee_detected
+        return frame
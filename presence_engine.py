@@ -0,0 +1,166 @@
+import math
+from collections import deque
+
+# Minimum voting window and EWMA time constant, in analysis sample periods.
+# Below this a single glitched sample dominates both signals.
+MIN_WINDOW_SAMPLES = 4
+MIN_TAU_SAMPLES = 2
+
+
+class PresenceEngine:
+    """Debounced presence decisions from noisy per-frame detections.
+
+    Every observation is a (timestamp, detected, confidence) triple. The engine
+    combines two signals over time rather than over frame counts, so skipping
+    frames for performance does not change how long a state has to persist:
+
+    - N-of-M voting: the share of positive observations inside the last
+      ``window`` seconds.
+    - EWMA confidence: an exponentially weighted average of the detection
+      confidence with time constant ``ewma_tau`` seconds.
+
+    The state only switches to present when both signals clear the enter
+    thresholds, and only switches back to absent when both fall to the exit
+    thresholds. Keeping enter above exit gives the hysteresis band that stops
+    single-frame flicker.
+
+    The confidence thresholds default to fractions of ``detection_threshold``
+    (0.8 to enter, 0.3 to exit), so a person who is constantly detected just
+    above the detection threshold is still marked present.
+
+    ``sample_interval`` is the expected time between observations. When it is
+    set, ``window`` and ``ewma_tau`` are raised to at least a few sample
+    periods, so hysteresis keeps working at low analysis rates.
+    """
+
+    def __init__(self, window=1.5, enter_ratio=0.6, exit_ratio=0.2,
+                 enter_confidence=None, exit_confidence=None, ewma_tau=0.75,
+                 detection_threshold=0.5, sample_interval=0):
+        if enter_confidence is None:
+            enter_confidence = 0.8 * detection_threshold
+        if exit_confidence is None:
+            exit_confidence = 0.3 * detection_threshold
+
+        if not 0.0 <= exit_ratio <= enter_ratio <= 1.0:
+            raise ValueError("Expected 0 <= exit_ratio <= enter_ratio <= 1")
+        if exit_confidence > enter_confidence:
+            raise ValueError("exit_confidence must not exceed enter_confidence")
+        if enter_confidence > detection_threshold:
+            # Detections never score below the threshold, but the EWMA can stay just above it
+            raise ValueError("enter_confidence must not exceed the detection confidence threshold")
+        if window <= 0 or ewma_tau <= 0:
+            raise ValueError("window and ewma_tau must be positive")
+        if sample_interval < 0:
+            raise ValueError("sample_interval must not be negative")
+
+        window = max(window, MIN_WINDOW_SAMPLES * sample_interval)
+        ewma_tau = max(ewma_tau, MIN_TAU_SAMPLES * sample_interval)
+
+        self.window = float(window)
+        self.enter_ratio = float(enter_ratio)
+        self.exit_ratio = float(exit_ratio)
+        self.enter_confidence = float(enter_confidence)
+        self.exit_confidence = float(exit_confidence)
+        self.ewma_tau = float(ewma_tau)
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config, detection_threshold=None):
+        """Build an engine from a tracking config dict, using defaults for missing keys
+
+        The detection threshold is taken from the config's ``confidence`` key
+        unless given explicitly, and the sample interval from ``analysis_fps``.
+        """
+        if detection_threshold is None:
+            detection_threshold = config.get("confidence", 0.5)
+        analysis_fps = float(config.get("analysis_fps", 0) or 0)
+        enter_confidence = config.get("presence_enter_confidence")
+        exit_confidence = config.get("presence_exit_confidence")
+        return cls(
+            window=float(config.get("presence_window", 1.5)),
+            enter_ratio=float(config.get("presence_enter_ratio", 0.6)),
+            exit_ratio=float(config.get("presence_exit_ratio", 0.2)),
+            enter_confidence=float(enter_confidence) if enter_confidence not in (None, "") else None,
+            exit_confidence=float(exit_confidence) if exit_confidence not in (None, "") else None,
+            ewma_tau=float(config.get("presence_ewma_tau", 0.75)),
+            detection_threshold=float(detection_threshold),
+            sample_interval=1.0 / analysis_fps if analysis_fps > 0 else 0,
+        )
+
+    def reset(self, present=False):
+        """Clear all history and start from the given state"""
+        self.present = present
+        self.confidence = 1.0 if present else 0.0
+        self.last_seen = None
+        self.last_timestamp = None
+        self._votes = deque()  # (timestamp, detected)
+        self._positive_votes = 0
+
+    @property
+    def vote_ratio(self):
+        """Share of positive observations currently inside the voting window"""
+        if not self._votes:
+            return 0.0
+        return self._positive_votes / len(self._votes)
+
+    def update(self, timestamp, detected, confidence=None):
+        """Feed one observation and return the new state if it changed, else None
+
+        ``confidence`` defaults to 1.0 for a positive and 0.0 for a negative
+        observation. Observations older than the previous one are ignored.
+        """
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return None
+
+        detected = bool(detected)
+        if confidence is None:
+            confidence = 1.0 if detected else 0.0
+        elif not detected:
+            confidence = 0.0
+
+        # EWMA weighted by elapsed time so irregular frame gaps are handled.
+        # It starts from the current state, so a single frame can't flip it.
+        if self.last_timestamp is not None:
+            dt = timestamp - self.last_timestamp
+            alpha = 1.0 - math.exp(-dt / self.ewma_tau)
+            self.confidence += alpha * (float(confidence) - self.confidence)
+        self.last_timestamp = timestamp
+
+        if detected:
+            self.last_seen = timestamp
+
+        # Slide the voting window
+        self._votes.append((timestamp, detected))
+        self._positive_votes += detected
+        cutoff = timestamp - self.window
+        while self._votes and self._votes[0][0] < cutoff:
+            _, old = self._votes.popleft()
+            self._positive_votes -= old
+
+        ratio = self.vote_ratio
+        if not self.present:
+            if ratio >= self.enter_ratio and self.confidence >= self.enter_confidence:
+                self.present = True
+                return True
+        else:
+            if ratio <= self.exit_ratio and self.confidence <= self.exit_confidence:
+                self.present = False
+                return False
+        return None
+
+
+def replay(trace, engine=None, **engine_kwargs):
+    """Run a recorded detection trace through a presence engine
+
+    ``trace`` is an iterable of (timestamp, detected, confidence) tuples.
+    Returns a list of (timestamp, present) transitions.
+    """
+    if engine is None:
+        engine = PresenceEngine(**engine_kwargs)
+
+    transitions = []
+    for timestamp, detected, confidence in trace:
+        change = engine.update(timestamp, detected, confidence)
+        if change is not None:
+            transitions.append((timestamp, change))
+    return transitions
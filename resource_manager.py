@@ -0,0 +1,258 @@
+import os
+import threading
+import time
+
+# cv2 and numpy are imported lazily: BLAS thread limits only take effect if they
+# are set before NumPy (and OpenCV, which loads it) is first imported.
+
+BLAS_THREAD_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+STAGES = ("inference", "decode", "encode")
+
+
+def limit_blas_threads(threads):
+    """Cap BLAS/OpenMP thread pools unless they were already set in the environment"""
+    for var in BLAS_THREAD_VARS:
+        os.environ.setdefault(var, str(threads))
+
+
+class ResourceManager:
+    """Assigns thread budgets and optional CPU affinity per stream and stage.
+
+    The available cores are split into a reserved set for the web server and
+    JPEG encoding (the ``encode`` stage) and a pool shared out evenly between
+    registered streams. Each stream's ``inference`` stage gets its slice of
+    the pool. Decoding runs on the same thread as inference, so the ``decode``
+    stage shares those cores and only has its own decoder thread count. Adding a
+    stream shrinks every stream's slice, instead of letting OpenCV, BLAS and
+    the server threads oversubscribe the machine.
+
+    OpenCV's thread pool is process-wide, so ``cv2.setNumThreads`` is set to
+    the per-stream inference budget. Affinity is applied per thread via
+    ``apply()`` and only when ``pin_threads`` is enabled (Linux only). OpenCV's
+    worker threads inherit the affinity of the thread that creates them, so
+    applying the ``inference`` stage also rebuilds the pool from the pinned
+    thread. With several streams the pool follows whichever stream rebuilt it
+    last, so inference affinity is only strictly enforced for a single stream.
+
+    ``auto_calibrate`` tells callers whether ``calibrate()`` should run
+    automatically at startup and when the model loads.
+    """
+
+    def __init__(self, reserved_cores=1, max_inference_threads=None, pin_threads=False,
+                 auto_calibrate=True):
+        if hasattr(os, "sched_getaffinity"):
+            self.cpus = sorted(os.sched_getaffinity(0))
+        else:
+            self.cpus = list(range(os.cpu_count() or 1))
+
+        # Always leave at least one core for the streams
+        self.reserved_cores = max(0, min(int(reserved_cores), len(self.cpus) - 1))
+        self.max_inference_threads = max_inference_threads
+        self.pin_threads = pin_threads and hasattr(os, "sched_setaffinity")
+        self.auto_calibrate = auto_calibrate
+
+        self.calibration = None
+        self.opencv_threads = None
+        self.streams = {}  # name -> {stage: {"threads": n, "cpus": [...]}}
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+        self._rebalance()
+
+    @classmethod
+    def from_env(cls):
+        """Build a manager from environment variables and cap BLAS threads
+
+        RESOURCE_RESERVED_CORES, RESOURCE_MAX_INFERENCE_THREADS,
+        RESOURCE_PIN_THREADS (1/true), RESOURCE_CALIBRATE (0/false) and
+        RESOURCE_BLAS_THREADS override the defaults.
+        """
+        # NumPy is only used for light array work here, OpenCV does the heavy lifting.
+        # This has to happen before the manager itself loads OpenCV.
+        limit_blas_threads(int(os.environ.get("RESOURCE_BLAS_THREADS", 1)))
+
+        max_threads = os.environ.get("RESOURCE_MAX_INFERENCE_THREADS")
+        return cls(
+            reserved_cores=int(os.environ.get("RESOURCE_RESERVED_CORES", 1)),
+            max_inference_threads=int(max_threads) if max_threads else None,
+            pin_threads=os.environ.get("RESOURCE_PIN_THREADS", "").lower() in ("1", "true", "yes"),
+            auto_calibrate=os.environ.get("RESOURCE_CALIBRATE", "1").lower() not in ("0", "false", "no")
+        )
+
+    @property
+    def reserved_cpus(self):
+        return self.cpus[len(self.cpus) - self.reserved_cores:] if self.reserved_cores else []
+
+    @property
+    def stream_cpus(self):
+        return self.cpus[:len(self.cpus) - self.reserved_cores]
+
+    def register_stream(self, name):
+        """Add a stream and rebalance budgets, returning its allocation"""
+        with self.lock:
+            self.streams[name] = {}
+            self._rebalance()
+            return self.streams[name]
+
+    def unregister_stream(self, name):
+        """Remove a stream and give its cores back to the others"""
+        with self.lock:
+            self.streams.pop(name, None)
+            self._rebalance()
+
+    def _rebalance(self):
+        """Split the stream cores between registered streams and update OpenCV"""
+        pool = self.stream_cpus
+        count = max(1, len(self.streams))
+
+        # Contiguous slices, wrapping around if there are more streams than cores
+        share = max(1, len(pool) // count)
+        inference_threads = share
+        if self.calibration is not None:
+            inference_threads = min(inference_threads, self.calibration["best_threads"])
+        if self.max_inference_threads:
+            inference_threads = min(inference_threads, self.max_inference_threads)
+        inference_threads = max(1, inference_threads)
+
+        encode_cpus = self.reserved_cpus or pool
+        for i, name in enumerate(sorted(self.streams)):
+            start = (i * share) % len(pool)
+            cpus = [pool[(start + j) % len(pool)] for j in range(share)]
+            self.streams[name] = {
+                "inference": {"threads": inference_threads, "cpus": cpus},
+                "decode": {"threads": 1, "cpus": cpus, "shared_with": "inference"},
+                "encode": {"threads": 1, "cpus": list(encode_cpus)},
+            }
+
+        self.opencv_threads = inference_threads
+        try:
+            import cv2
+            cv2.setNumThreads(self.opencv_threads)
+        except ImportError:
+            pass
+
+    def budget(self, name, stage):
+        """Get the {"threads", "cpus"} budget of a stream's stage"""
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+        with self.lock:
+            allocation = self.streams.get(name)
+            if not allocation:
+                return {"threads": self.opencv_threads, "cpus": list(self.stream_cpus)}
+            return allocation[stage]
+
+    def apply(self, name, stage):
+        """Pin the calling thread to the stage's cores (if pinning is enabled)
+
+        Cheap to call repeatedly: the affinity is only changed when the
+        thread's assignment differs from the last one applied. For the
+        ``inference`` stage OpenCV's pool is then rebuilt, so its workers are
+        created by (and inherit the affinity of) the calling thread.
+        """
+        budget = self.budget(name, stage)
+        if self.pin_threads:
+            cpus = tuple(budget["cpus"])
+            if getattr(self._local, "cpus", None) != cpus:
+                try:
+                    os.sched_setaffinity(0, cpus)
+                    self._local.cpus = cpus
+                except OSError:
+                    return budget
+                if stage == "inference":
+                    self._rebuild_opencv_pool()
+        return budget
+
+    def _rebuild_opencv_pool(self):
+        """Recreate OpenCV's worker threads from the calling thread
+
+        Dropping to one thread stops the current workers. Restoring the budget
+        makes the next parallel call from this thread spawn new ones, which
+        inherit its affinity.
+        """
+        import cv2
+        import numpy as np
+
+        cv2.setNumThreads(1)
+        cv2.setNumThreads(self.opencv_threads)
+        # A small parallel job spawns the workers here rather than on another thread
+        cv2.GaussianBlur(np.zeros((256, 256), dtype=np.uint8), (5, 5), 0)
+
+    def capture_params(self, name):
+        """VideoCapture open parameters limiting the decoder's threads"""
+        import cv2
+        if not hasattr(cv2, "CAP_PROP_N_THREADS"):
+            return []
+        return [cv2.CAP_PROP_N_THREADS, self.budget(name, "decode")["threads"]]
+
+    def calibrate(self, workload=None, max_seconds=1.0):
+        """Time a workload at increasing OpenCV thread counts and pick the budget
+
+        The chosen count is the smallest one within 10% of the best throughput,
+        so threads that only add contention are left free for other streams.
+        Without a workload a synthetic resize/blur on a 720p frame is used.
+        """
+        import cv2
+        import numpy as np
+
+        if workload is None:
+            frame = np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+
+            def workload():
+                small = cv2.resize(frame, (600, 338))
+                cv2.GaussianBlur(small, (9, 9), 0)
+                cv2.dnn.blobFromImage(small, 1/255.0, (416, 416), swapRB=True, crop=False)
+
+        candidates = []
+        threads = 1
+        while threads <= max(1, len(self.stream_cpus)):
+            candidates.append(threads)
+            threads *= 2
+        if candidates[-1] != len(self.stream_cpus) and len(self.stream_cpus) > 1:
+            candidates.append(len(self.stream_cpus))
+
+        # Split the time budget between candidates, with one warm-up run each
+        per_candidate = max_seconds / len(candidates)
+        results = {}
+        for threads in candidates:
+            cv2.setNumThreads(threads)
+            workload()
+            runs = 0
+            start = time.perf_counter()
+            while True:
+                workload()
+                runs += 1
+                elapsed = time.perf_counter() - start
+                if elapsed >= per_candidate or runs >= 50:
+                    break
+            results[threads] = runs / elapsed
+
+        best_rate = max(results.values())
+        best_threads = min(t for t, rate in results.items() if rate >= 0.9 * best_rate)
+
+        with self.lock:
+            self.calibration = {
+                "throughput": {str(t): round(rate, 1) for t, rate in results.items()},
+                "best_threads": best_threads
+            }
+            self._rebalance()
+        return self.calibration
+
+    def report(self):
+        """Summarise the current resource plan"""
+        with self.lock:
+            return {
+                "cpus": list(self.cpus),
+                "reserved_cpus": list(self.reserved_cpus),
+                "pin_threads": self.pin_threads,
+                "opencv_threads": self.opencv_threads,
+                "blas_threads": {var: os.environ.get(var) for var in BLAS_THREAD_VARS},
+                "calibration": self.calibration,
+                "streams": {name: dict(stages) for name, stages in self.streams.items()}
+            }
@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from detection_cache import DetectionCache
+
+# Person box in the middle of a 600x450 frame, inside the (100, 100, 500, 400) area
+PERSON = (0.5, 0.5, 0.2, 0.4)
+CHAIR = (0.2, 0.8, 0.1, 0.1)
+
+
+def record(cache, key, frames, fps=10, detected_at=lambda t: True, confidence=0.6, expected_frames=None):
+    """Record a synthetic entry with a person (when detected) and a chair in every frame"""
+    writer = cache.writer(key, {"frame_size": [600, 450], "fps": fps, "min_confidence": 0.05})
+    for i in frames:
+        t = i / fps
+        boxes, scores, classes = [CHAIR], [0.9], [56]
+        if detected_at(t):
+            boxes.append(PERSON)
+            scores.append(confidence)
+            classes.append(0)
+        writer.add(i, t, boxes, scores, classes)
+    return writer.commit(expected_frames)
+
+
+def entry_size(cache, key):
+    return cache._entry_size(os.path.join(cache.cache_dir, key))
+
+
+def test_lookup_by_frame_index(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    entry = record(cache, "video", [2, 0, 1, 3], detected_at=lambda t: t < 0.2)
+
+    assert len(entry) == 4
+    assert list(entry.frame_indices) == [0, 1, 2, 3]
+
+    boxes, scores, classes = entry.lookup(1)
+    assert list(classes) == [56, 0]
+    assert boxes[1] == pytest.approx(PERSON)
+    assert list(entry.lookup(3)[2]) == [56]
+    assert entry.lookup(10) is None
+
+    assert cache.load("video").meta["detections"] == 6
+    assert cache.load("missing") is None
+
+
+def test_complete_only_with_every_frame(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+
+    assert record(cache, "full", range(50), expected_frames=50).meta["complete"]
+    assert record(cache, "unknown_total", range(50), expected_frames=0).meta["complete"]
+    assert not record(cache, "cut_short", range(30), expected_frames=50).meta["complete"]
+    assert not record(cache, "gap", [i for i in range(50) if i != 20], expected_frames=0).meta["complete"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    record(cache, "a", range(100))
+    size = entry_size(cache, "a")
+    # Room for two entries, with headroom as sizes vary by a few bytes of metadata
+    cache.max_bytes = 2 * size + size // 2
+
+    record(cache, "b", range(100))
+    os.utime(os.path.join(cache.cache_dir, "a"), (1000, 1000))
+    os.utime(os.path.join(cache.cache_dir, "b"), (2000, 2000))
+
+    # Using "a" makes "b" the least recently used entry
+    cache.load("a")
+    record(cache, "c", range(100))
+
+    assert sorted(os.listdir(cache.cache_dir)) == ["a", "c"]
+
+
+def test_never_evicts_the_entry_being_stored(tmp_path):
+    cache = DetectionCache(str(tmp_path), max_bytes=1)
+    record(cache, "a", range(100))
+    record(cache, "b", range(100))
+
+    assert os.listdir(cache.cache_dir) == ["b"]
+    assert cache.load("b") is not None
+
+
+def test_corrupt_entry_is_discarded(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    record(cache, "video", range(10))
+    os.remove(os.path.join(cache.cache_dir, "video", "boxes.npy"))
+
+    assert cache.load("video") is None
+    assert not os.path.exists(os.path.join(cache.cache_dir, "video"))
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    pytest.importorskip("cv2")
+    pytest.importorskip("werkzeug")
+    from employee_tracking_fixed import EmployeeTracker
+
+    monkeypatch.chdir(tmp_path)
+    tracker = EmployeeTracker()
+    tracker.monitor_area = (100, 100, 500, 400)
+    tracker.video_cache_key = "video"
+    return tracker
+
+
+def test_replay_events_follow_settings(tracker):
+    # Present for 20 s, away for 20 s, back for 20 s
+    record(tracker.detection_cache, "video", range(600),
+           detected_at=lambda t: t < 20 or t >= 40, expected_frames=600)
+
+    result = tracker.replay_cached({"absence_threshold": 5, "confidence": 0.5})
+    assert result["status"] == "success"
+    assert result["frames"] == 600
+    events = result["events"]
+    assert [e["event"] for e in events] == ["absent", "returned"]
+    # Absence counts from the last detection at 19.9 s
+    assert 24.9 <= events[0]["time"] < 27
+    assert 40 <= events[1]["time"] < 41
+    assert events[1]["absence_duration"] == pytest.approx(20, abs=1)
+
+    # The absence is shorter than a 30 s threshold
+    result = tracker.replay_cached({"absence_threshold": 30, "confidence": 0.5})
+    assert [e["event"] for e in result["events"]] == ["returned"]
+
+    # Above the person's confidence nobody is ever detected
+    assert tracker.replay_cached({"confidence": 0.7})["events"] == []
+
+    # A monitoring area away from the person
+    result = tracker.replay_cached({"area_method": "manual", "manual_coords": "0,0,100,100"})
+    assert result["events"] == []
+
+
+def test_replay_refuses_incomplete_entries(tracker):
+    record(tracker.detection_cache, "video", range(300), expected_frames=600)
+
+    result = tracker.replay_cached({"confidence": 0.5})
+    assert result["status"] == "error"
+
+
+def test_replay_refuses_confidence_below_cache_floor(tracker):
+    record(tracker.detection_cache, "video", range(100), expected_frames=100)
+
+    result = tracker.replay_cached({"confidence": 0.01})
+    assert result["status"] == "error"
@@ -0,0 +1,114 @@
+import pytest
+
+from presence_engine import PresenceEngine, replay
+
+
+def make_trace(fps, duration, detected_at, confidence=0.8):
+    """Build a (timestamp, detected, confidence) trace sampled at the given fps"""
+    trace = []
+    for i in range(int(duration * fps)):
+        t = i / fps
+        detected = detected_at(i, t)
+        trace.append((t, detected, confidence if detected else 0.0))
+    return trace
+
+
+def test_single_frame_dropouts_do_not_flip_state():
+    # Present for 5 s with a missed frame every 7 frames, then gone with a false positive every 11
+    trace = make_trace(30, 10, lambda i, t: (t < 5 and i % 7 != 3) or (t >= 5 and i % 11 == 0))
+    transitions = replay(trace)
+
+    assert [present for _, present in transitions] == [True, False]
+    assert transitions[0][0] < 1.0
+    assert 5.0 < transitions[1][0] < 7.0
+
+
+def test_single_positive_frame_does_not_enter():
+    trace = [(0.0, True, 0.9)] + make_trace(30, 3, lambda i, t: False)[1:]
+    assert replay(trace) == []
+
+
+def test_timing_matches_across_frame_rates():
+    def detected_at(i, t):
+        return 2.0 <= t < 6.0
+
+    fast = replay(make_trace(30, 10, detected_at))
+    slow = replay(make_trace(5, 10, detected_at))
+
+    assert [p for _, p in fast] == [p for _, p in slow] == [True, False]
+    # Decisions may differ by at most one sample period of the slower trace
+    for (t_fast, _), (t_slow, _) in zip(fast, slow):
+        assert abs(t_fast - t_slow) <= 1 / 5 + 1e-9
+
+
+@pytest.mark.parametrize("fps", [5, 1, 0.5, 0.25])
+def test_single_glitches_at_low_analysis_rates(fps):
+    # Present, gone, present again; one missed sample at 20 s and one false positive at 60 s
+    def detected_at(i, t):
+        if t == 20:
+            return False
+        if t == 60:
+            return True
+        return t < 40 or t >= 80
+
+    trace = make_trace(fps, 120, detected_at)
+    engine = PresenceEngine.from_config({"analysis_fps": fps})
+    transitions = replay(trace, engine=engine)
+
+    assert [present for _, present in transitions] == [True, False, True]
+    assert 40 < transitions[1][0] < 60
+    assert 80 <= transitions[2][0] < 100
+
+
+def test_window_and_smoothing_scale_with_analysis_rate():
+    engine = PresenceEngine.from_config({"analysis_fps": 0.5})
+    assert engine.window == pytest.approx(8.0)
+    assert engine.ewma_tau == pytest.approx(4.0)
+
+    # Longer configured values are kept
+    engine = PresenceEngine.from_config({"analysis_fps": 0.5, "presence_window": 20, "presence_ewma_tau": 10})
+    assert engine.window == 20
+    assert engine.ewma_tau == 10
+
+    engine = PresenceEngine.from_config({"analysis_fps": 30})
+    assert engine.window == pytest.approx(1.5)
+
+
+def test_out_of_order_timestamps_are_ignored():
+    engine = PresenceEngine()
+    replay(make_trace(30, 2, lambda i, t: True), engine=engine)
+    assert engine.present
+    confidence = engine.confidence
+
+    assert engine.update(0.5, False, 0.0) is None
+    assert engine.present
+    assert engine.confidence == confidence
+    assert engine.last_timestamp == pytest.approx(59 / 30)
+
+
+def test_detections_just_above_a_low_threshold_are_present():
+    trace = [(i / 30, True, 0.35) for i in range(300)]
+    transitions = replay(trace, engine=PresenceEngine.from_config({"confidence": 0.3}))
+    assert transitions and transitions[0][1] is True
+
+
+@pytest.mark.parametrize("config", [
+    {"presence_enter_ratio": 0.2, "presence_exit_ratio": 0.5},
+    {"presence_enter_ratio": 1.5},
+    {"presence_enter_confidence": 0.2, "presence_exit_confidence": 0.3},
+    {"confidence": 0.3, "presence_enter_confidence": 0.4},
+    {"presence_window": 0},
+    {"presence_ewma_tau": -1},
+])
+def test_from_config_rejects_invalid_settings(config):
+    with pytest.raises(ValueError):
+        PresenceEngine.from_config(config)
+
+
+def test_from_config_defaults_follow_detection_threshold():
+    engine = PresenceEngine.from_config({"confidence": "0.3"})
+    assert engine.enter_confidence == pytest.approx(0.24)
+    assert engine.exit_confidence == pytest.approx(0.09)
+
+    engine = PresenceEngine.from_config({"confidence": 0.9}, detection_threshold=0.5)
+    assert engine.enter_confidence == pytest.approx(0.4)